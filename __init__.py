@@ -1,6 +1,11 @@
 from sw_properties.sw_utils import parse_units
 from sw_properties.sw_density import (rho_plain_water, delta_rho,
-                                      rho_plain, rho_sw,
+                                      powers, rho_plain_water_pow,
+                                      delta_rho_pow, ddelta_rho_ds_pow,
+                                      rho_plain, rho_sw, rho_sw_batch,
+                                      rho_sw_soa, rho_sw_inplace,
+                                      rho_plain_water_f32, delta_rho_f32,
+                                      rho_sw_f32,
                                       drho_plain_water_dT,
                                       drho_plain_water_ds,
                                       ddelta_rho_dT,
@@ -8,6 +13,20 @@ from sw_properties.sw_density import (rho_plain_water, delta_rho,
                                       drho_sw_dT,
                                       drho_sw_ds,
                                       target_salinity,
-                                      required_salinity)
+                                      target_salinity_prime,
+                                      target_salinity_prime2,
+                                      required_salinity,
+                                      solve_salinity)
 from sw_properties.sw_kviscosity import kinematic_viscosity
 from sw_properties.sw_viscosity import dynamic_viscosity
+
+# jax is optional and slow to import, so sw_density_jax is only loaded the 
+# first time one of its functions is requested from the package
+_JAX_NAMES = ('rho_sw_jax', 'drho_sw_dT_jax', 'drho_sw_ds_jax')
+
+
+def __getattr__(name):
+    if name in _JAX_NAMES:
+        from sw_properties import sw_density_jax
+        return getattr(sw_density_jax, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -60,7 +60,23 @@
            substance, 1996. 
 """
 
-from sw_properties.sw_utils import parse_units
+from functools import lru_cache
+
+import numpy as np
+
+from sw_properties.sw_utils import parse_units, _parse_units_fast
+
+try:
+    from sw_properties.sw_density_numba import (_rho_sw_kernel,
+                                                _rho_sw_fixed_s_kernel,
+                                                _rho_sw_pairs_kernel)
+except ImportError:     # numba is optional
+    _rho_sw_kernel = _rho_sw_fixed_s_kernel = _rho_sw_pairs_kernel = None
+
+try:
+    import numexpr
+except ImportError:     # numexpr is optional
+    numexpr = None
 
 
 # Constants for the subfunctions
@@ -76,6 +92,28 @@ b = [8.0200240891E+02,
     -3.0600536746E-05,    
     -1.6132224742E-05]
 
+# Coefficients as arrays, for numpy.polynomial and numba evaluation of
+# array input
+_A = np.array(a)
+_B = np.array(b)
+
+# Single precision coefficients, for the *_f32 functions
+_A32 = _A.astype(np.float32)
+_B32 = _B.astype(np.float32)
+
+# rho_sw as a single expression for numexpr, with the coefficients as names
+_RHO_SW_EXPR = ("a0 + T*(a1 + T*(a2 + T*(a3 + T*a4)))"
+                " + s*(b0 + T*(b1 + T*(b2 + s*b4 + T*b3)))")
+_RHO_SW_CONSTS = {**{f'a{k}': ak for k, ak in enumerate(a)},
+                  **{f'b{k}': bk for k, bk in enumerate(b)}}
+
+# Arrays larger than this are evaluated with the numba kernel or numexpr, 
+# if available
+_KERNEL_MIN_SIZE = 1024
+
+# Block length for rho_sw_batch without numba, chosen so that the input, 
+# output and scratch arrays for one block stay resident in the L2 cache
+_BATCH_CHUNK = 8192
 
 
 def rho_plain_water(T):
@@ -83,8 +121,15 @@ def rho_plain_water(T):
     Returns the density of plain water
 
     Temperature must be in deg C
+
+    Scalar input is evaluated with Estrin's scheme, which splits the
+    polynomial into independent halves in T and T**2.  The result differs
+    from the Horner form only by rounding (a few ulp).
     '''
-    return a[0] + a[1]*T + a[2]*T**2 + a[3]*T**3 + a[4]*T**4
+    if isinstance(T, np.ndarray):
+        return np.polynomial.polynomial.polyval(T, _A)
+    T2 = T*T
+    return (a[0] + a[1]*T) + T2*((a[2] + a[3]*T) + T2*a[4])
 
 
 def delta_rho(T, s=0.0):
@@ -93,8 +138,50 @@ def delta_rho(T, s=0.0):
     
     Temperature must be in deg C.  Salinity must be in kg / kg
     '''
-    return (b[0]*s + b[1]*s*T + b[2]*s*T**2 + b[3]*s*T**3 
-            + b[4]*s**2*T**2)
+    return s*(b[0] + T*(b[1] + T*(b[2] + s*b[4] + T*b[3])))
+
+
+def powers(T):
+    '''
+    Returns the powers (T, T**2, T**3, T**4) used by the *_pow functions
+
+    Temperature must be in deg C
+    '''
+    T2 = T*T
+    return T, T2, T2*T, T2*T2
+
+
+def rho_plain_water_pow(T, T2, T3, T4):
+    '''
+    Returns the density of plain water from precomputed powers of T
+
+    As rho_plain_water, for use with powers when several functions are 
+    evaluated at the same temperature (e.g. in solve_salinity).  For a 
+    single evaluation, use rho_plain_water.
+    '''
+    return a[0] + a[1]*T + a[2]*T2 + a[3]*T3 + a[4]*T4
+
+
+def delta_rho_pow(T, T2, T3, s=0.0):
+    '''
+    Returns the density increase due to salinity from precomputed powers
+    of T
+
+    As delta_rho, for use with powers when several functions are 
+    evaluated at the same temperature.
+    '''
+    return s*(b[0] + b[1]*T + (b[2] + s*b[4])*T2 + b[3]*T3)
+
+
+def ddelta_rho_ds_pow(T, T2, T3, s=0.0):
+    '''
+    Returns derivative of delta_rho wrt salinity from precomputed powers
+    of T
+
+    As ddelta_rho_ds, for use with powers when several functions are 
+    evaluated at the same temperature.
+    '''
+    return b[0] + b[1]*T + (b[2] + 2*s*b[4])*T2 + b[3]*T3
 
 
 def rho_plain(T, S=0., output_units='cgs', uT='C', uS='ppt'):
@@ -126,7 +213,7 @@ def rho_plain(T, S=0., output_units='cgs', uT='C', uS='ppt'):
     return rho_w
 
 
-def rho_sw(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
+def rho_sw(T, S=0.0, uT='C', uS='ppt', output_units='cgs', _unchecked=False):
     """
     returns an estimate for the density of water as a function of both 
     temperature and salinity.
@@ -146,24 +233,272 @@ def rho_sw(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
 
     Note that the subfunctions use the fractional salinity, whereas the input 
     salinity is in ppt by default.  This is dealt with using the "parse_units"
-    routine from sw_utils.  
+    routine from sw_utils.  The range check in parse_units is skipped if
+    _unchecked is True, for inputs already known to be valid.
     """
-    T, s = parse_units(T, S, uT, uS)  # Temp and salinity in °C and kg/kg
-    rho_w  = rho_plain_water(T)
-    d_rho  = delta_rho(T, s)
-    rho_sw = rho_w + d_rho
+    parse = _parse_units_fast if _unchecked else parse_units
+    T, s = parse(T, S, uT, uS)  # Temp and salinity in °C and kg/kg
+    rho_sw = _rho_sw_raw(T, s)
     if output_units == 'cgs':
         rho_sw /= 1e3
-        rho_w  /= 1e3
 
     return rho_sw
 
 
+def rho_plain_water_f32(T):
+    '''
+    Returns the density of plain water, evaluated in single precision
+
+    Temperature must be in deg C
+    '''
+    return np.polynomial.polynomial.polyval(np.asarray(T, dtype=np.float32),
+                                            _A32)
+
+
+def delta_rho_f32(T, s=0.0):
+    '''
+    Returns the density increase due to salinity, evaluated in single 
+    precision
+    
+    Temperature must be in deg C.  Salinity must be in kg / kg
+    '''
+    T = np.asarray(T, dtype=np.float32)
+    s = np.asarray(s, dtype=np.float32)
+    b0, b1, b2, b3, b4 = _B32
+    return s*(b0 + T*(b1 + T*(b2 + s*b4 + T*b3)))
+
+
+def rho_sw_f32(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
+    """
+    returns an estimate for the density of water as a function of both 
+    temperature and salinity, evaluated in single precision.
+
+    Parameters
+    ----------
+    T : float or array-like
+        Temperature
+    S : float or array-like
+        Salinity 
+    uT : str
+        Units of temperature, default is 'C' for degC
+    uS : str
+        Units of salinity, default is 'ppt' (equiv. to g/kg)
+    output_units : str
+        Units system for the output either 'cgs' or 'mks', default is 'cgs'
+
+    T and S are cast to float32 before the units are parsed, so every 
+    intermediate and the result are float32.  The rounding error (about 
+    1e-7 relative) is well below the 0.1% accuracy of the correlation, and 
+    the memory traffic for large arrays is half that of rho_sw.
+
+    See also
+    --------
+    rho_sw
+    """
+    # Cast first, so that the unit conversion is also done in float32
+    T, s = parse_units(np.asarray(T, dtype=np.float32),
+                       np.asarray(S, dtype=np.float32),
+                       uT, uS)  # Temp and salinity in °C and kg/kg
+    rho_sw = rho_plain_water_f32(T) + delta_rho_f32(T, s)
+    if output_units == 'cgs':
+        rho_sw /= np.float32(1e3)
+
+    return rho_sw
+
+
+def rho_sw_batch(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
+    """
+    returns an estimate for the density of water as a function of both 
+    temperature and salinity, for large arrays of T and S.
+
+    Parameters
+    ----------
+    T : float or array-like
+        Temperature
+    S : float or array-like
+        Salinity 
+    uT : str
+        Units of temperature, default is 'C' for degC
+    uS : str
+        Units of salinity, default is 'ppt' (equiv. to g/kg)
+    output_units : str
+        Units system for the output either 'cgs' or 'mks', default is 'cgs'
+
+    T and S are broadcast against each other and the units are parsed once
+    for the whole array.  The polynomial is evaluated by the numba kernel 
+    if available.  Otherwise it is evaluated in blocks of _BATCH_CHUNK 
+    elements as in rho_sw_inplace, with numpy ufuncs writing into 
+    preallocated buffers rather than creating a new temporary array for 
+    each operation.
+
+    See also
+    --------
+    rho_sw
+    """
+    T, s = parse_units(np.asarray(T, dtype=float), np.asarray(S, dtype=float),
+                       uT, uS)  # Temp and salinity in °C and kg/kg
+    if _rho_sw_kernel is not None:
+        rho = _rho_sw_jit(T, s)
+    else:
+        T, s  = np.broadcast_arrays(T, s)
+        rho   = np.empty(T.shape)
+        T     = np.ascontiguousarray(T).ravel()
+        s     = np.ascontiguousarray(s).ravel()
+        out   = rho.reshape(-1)
+        tmp   = np.empty(min(_BATCH_CHUNK, T.size))
+        for i in range(0, T.size, _BATCH_CHUNK):
+            j = min(i + _BATCH_CHUNK, T.size)
+            _rho_sw_into(T[i:j], s[i:j], out[i:j], tmp[:j - i])
+
+    if output_units == 'cgs':
+        np.divide(rho, 1e3, out=rho)
+
+    return rho
+
+
+def rho_sw_soa(TS, output_units='cgs'):
+    """
+    returns an estimate for the density of water from a single array 
+    holding both temperature and salinity.
+
+    Parameters
+    ----------
+    TS : array-like, shape (2, N) or (N, 2)
+        Temperature/[degC] and salinity/[kg/kg], either as the two rows of 
+        a (2, N) array or the two columns of an (N, 2) array.  A (2, 2) 
+        array is read as rows.
+    output_units : str
+        Units system for the output either 'cgs' or 'mks', default is 'cgs'
+
+    This is the entry point for performance-sensitive code: as for the 
+    subfunctions, no unit parsing or range checking is done, and T and s
+    are read from one contiguous buffer rather than two separate arrays.
+
+    See also
+    --------
+    rho_sw, rho_sw_batch
+    """
+    TS = np.ascontiguousarray(TS, dtype=float)
+    if TS.ndim != 2 or 2 not in TS.shape:
+        raise ValueError('TS must have shape (2, N) or (N, 2)')
+
+    if TS.shape[0] == 2:
+        rho = _rho_sw_raw(TS[0], TS[1])
+    elif _rho_sw_pairs_kernel is not None:
+        rho = _rho_sw_pairs_kernel(TS, _A, _B, np.empty(TS.shape[0]))
+    else:
+        rho = _rho_sw_raw(TS[:, 0], TS[:, 1])
+
+    if output_units == 'cgs':
+        rho /= 1e3
+
+    return rho
+
+
+def rho_sw_inplace(T, s=0.0, out=None):
+    '''
+    Returns the density of seawater in mks units, evaluated into out
+
+    Temperature must be in deg C.  Salinity must be in kg / kg
+
+    out, if given, must have the broadcast shape of T and s.  The Horner 
+    form is evaluated with numpy ufuncs writing into out and a single 
+    scratch array, so only one temporary is allocated however large the 
+    input.
+
+    out may be T or s itself (e.g. rho_sw_inplace(T, s, out=T)).  Since 
+    the inputs are read again after out is first written, an input that 
+    shares memory with out is copied first, at the cost of one more 
+    temporary.
+    '''
+    T = np.asarray(T, dtype=float)
+    s = np.asarray(s, dtype=float)
+    if out is None:
+        out = np.empty(np.broadcast(T, s).shape)
+    if np.may_share_memory(out, T):
+        T = T.copy()
+    if np.may_share_memory(out, s):
+        s = s.copy()
+    return _rho_sw_into(T, s, out, np.empty(out.shape))
+
+
+def _rho_sw_into(T, s, out, tmp):
+    '''
+    Evaluates the density of seawater in mks units into out, using tmp 
+    (of the same shape) as scratch space
+
+    out and tmp must not share memory with T or s.
+    '''
+    # Salinity contribution, s*(b0 + T*(b1 + T*(b2 + s*b4 + T*b3)))
+    np.multiply(s, b[4], out=out)
+    np.add(out, b[2], out=out)
+    np.multiply(T, b[3], out=tmp)
+    np.add(out, tmp, out=out)
+    for bk in b[1::-1]:
+        np.multiply(out, T, out=out)
+        np.add(out, bk, out=out)
+    np.multiply(out, s, out=out)
+
+    # Plain water, a0 + T*(a1 + T*(a2 + T*(a3 + T*a4)))
+    np.multiply(T, a[4], out=tmp)
+    for ak in a[3:0:-1]:
+        np.add(tmp, ak, out=tmp)
+        np.multiply(tmp, T, out=tmp)
+    np.add(tmp, a[0], out=tmp)
+    np.add(out, tmp, out=out)
+
+    return out
+
+
+def _rho_sw_raw(T, s=0.0):
+    '''
+    Returns the density of seawater in mks units, without unit parsing
+
+    Temperature must be in deg C.  Salinity must be in kg / kg
+    '''
+    if isinstance(T, np.ndarray) and T.size > _KERNEL_MIN_SIZE:
+        # Including plain water, which the fused back ends still evaluate
+        # faster than polyval
+        if _rho_sw_kernel is not None:
+            return _rho_sw_jit(T, s)
+        if numexpr is not None:
+            return numexpr.evaluate(_RHO_SW_EXPR,
+                                    local_dict={'T': T, 's': s,
+                                                **_RHO_SW_CONSTS})
+    if np.isscalar(s) and s == 0.0:
+        # Plain water, so skip the salinity polynomial entirely
+        return rho_plain_water(T)
+    return rho_plain_water(T) + delta_rho(T, s)
+
+
+def _rho_sw_jit(T, s):
+    '''
+    Evaluates rho_sw in mks units using the numba kernel
+
+    Temperature must be in deg C.  Salinity must be in kg / kg
+    '''
+    if np.ndim(s) == 0:
+        # A single salinity needs no array of s
+        out = np.empty(np.shape(T))
+        _rho_sw_fixed_s_kernel(np.ascontiguousarray(T, dtype=float).ravel(),
+                               float(s), _A, _B, out.ravel())
+        return out
+    T, s = np.broadcast_arrays(T, s)
+    out  = np.empty(T.shape)
+    _rho_sw_kernel(np.ascontiguousarray(T, dtype=float).ravel(),
+                   np.ascontiguousarray(s, dtype=float).ravel(),
+                   _A, _B, out.ravel())
+    return out
+
+
 def drho_plain_water_dT(T):
     """
     Returns derivative of rho_plain_water wrt temperature
+
+    Evaluated with Estrin's scheme, as for rho_plain_water
     """
-    return a[1] + 2*a[2]*T + 3*a[3]*T**2 + 4*a[4]*T**3
+    T2 = T*T
+    return (a[1] + 2*a[2]*T) + T2*(3*a[3] + 4*a[4]*T)
 
 
 def drho_plain_water_ds(T):
@@ -177,16 +512,14 @@ def ddelta_rho_dT(T, s=0.0):
     """
     Returns derivative of delta_rho wrt temperature
     """
-    return (b[1]*s + 2*b[2]*s*T + 3*b[3]*s*T**2
-        + 2*b[4]*s**2*T)
+    return s*(b[1] + T*(2*(b[2] + s*b[4]) + T*3*b[3]))
 
 
 def ddelta_rho_ds(T, s=0.0):
     """
     Returns derivative of delta_rho wrt salinity
     """
-    return (b[0] + b[1]*T + b[2]*T**2 + b[3]*T**3 
-            + 2*b[4]*s*T**2)
+    return b[0] + T*(b[1] + T*(b[2] + 2*s*b[4] + T*b[3]))
 
 
 def drho_sw_dT(T, s=0.0):
@@ -203,11 +536,39 @@ def drho_sw_ds(T, s=0.0):
     return ddelta_rho_ds(T, s)
 
 
+_rho_plain_water_cached = lru_cache(maxsize=128)(rho_plain_water)
+
+
 def target_salinity(S, target_density, T=20.):
     """
     Optimisation function for use in required_salinity
     """
-    return rho_sw(T, S) - target_density
+    T, s = _parse_units_fast(T, S)
+    if np.isscalar(T):
+        # T is held fixed while Newton's method varies S
+        rho_w = _rho_plain_water_cached(T)
+    else:
+        rho_w = rho_plain_water(T)
+    return (rho_w + delta_rho(T, s)) / 1e3 - target_density
+
+
+def target_salinity_prime(S, target_density, T=20.):
+    """
+    Derivative of target_salinity wrt S, for use in required_salinity
+
+    drho_sw_ds is in mks units per kg/kg; the factor 1e6 converts it to 
+    g/cm3 per g/kg.
+    """
+    T, s = _parse_units_fast(T, S)
+    return drho_sw_ds(T, s) / 1e6
+
+
+def target_salinity_prime2(S, target_density, T=20.):
+    """
+    Second derivative of target_salinity wrt S, for use in required_salinity
+    """
+    T, _ = _parse_units_fast(T, S)
+    return 2*b[4]*T*T / 1e9
 
 
 def required_salinity(target_density, S=0., T=20.):
@@ -215,6 +576,10 @@ def required_salinity(target_density, S=0., T=20.):
     Returns an estimate of the required salinity to achieve target_density
     using Newton's method (scipy.optimize.newton).  Uses 'cgs' units.
 
+    The analytic first and second derivatives of the density wrt salinity
+    are supplied, so that newton uses Halley's method rather than the 
+    secant method.
+
     Parameters
     ----------
     target_density : float
@@ -226,16 +591,66 @@ def required_salinity(target_density, S=0., T=20.):
 
     See also
     --------
-    target_salinity, rho_sw
+    target_salinity, target_salinity_prime, target_salinity_prime2, rho_sw
     """
     from scipy.optimize import newton
 
-    salinity = newton(target_salinity, x0=S, args=(target_density,T))
+    parse_units(T, S)   # Check the initial guess once, outside the loop
+    salinity = newton(target_salinity, x0=S, args=(target_density,T),
+                      fprime=target_salinity_prime,
+                      fprime2=target_salinity_prime2)
     print(f"Salinity for target density of {target_density} g/cm3: "
           + f"{salinity:.4f} g/kg")
     return salinity
 
 
+def solve_salinity(target_density, S=30., T=20., tol=1e-8, maxiter=20):
+    """
+    Returns estimates of the salinity required to achieve each of an array 
+    of target densities, using a vectorised Newton's method.  Uses 'cgs' 
+    units.
+
+    Parameters
+    ----------
+    target_density : float or array-like
+        The required density/[g/cm3]
+    S : float
+        An initial guess for salinity (optional).  Default is 30 g/kg
+    T : float or array-like
+        Temperature of the water (optional).  Default is 20°C.
+    tol : float
+        Tolerance on the density residual/[g/cm3].  Default is 1e-8
+    maxiter : int
+        Maximum number of iterations.  Default is 20
+
+    Every element is updated at once using the analytic derivative 
+    drho_sw_ds, rather than calling scipy.optimize.newton per element.  
+    The powers of T are shared between the residual and its derivative.
+    A RuntimeError is raised if any element has not converged after 
+    maxiter iterations.
+
+    See also
+    --------
+    required_salinity, rho_sw, drho_sw_ds
+    """
+    target_density = np.asarray(target_density, dtype=float)
+    T, _ = parse_units(T, S)
+    S = np.full(np.broadcast(target_density, T).shape, float(S))
+
+    # T is fixed, so its powers and the plain water density are computed 
+    # once for all iterations
+    T, T2, T3, T4 = powers(T)
+    rho_w = rho_plain_water_pow(T, T2, T3, T4)
+    for _ in range(maxiter):
+        s = S / 1e3
+        r = (rho_w + delta_rho_pow(T, T2, T3, s)) / 1e3 - target_density
+        if np.all(np.abs(r) < tol):
+            return S
+        S -= r / (ddelta_rho_ds_pow(T, T2, T3, s) / 1e6)
+
+    raise RuntimeError(f"Failed to converge after {maxiter} iterations")
+
+
 if __name__ == "__main__":
     import numpy as np
     import os, sys
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+"""
+    sw_density_jax    Density of seawater for JAX arrays
+
+     DESCRIPTION:
+       JAX versions of rho_sw and its derivatives, for T and S that are
+       already held as JAX arrays (e.g. on a GPU).  They are compiled with
+       jax.jit, and the derivatives are obtained with jax.grad rather than
+       from the hand-written expressions in sw_density.
+
+       As for the subfunctions in sw_density, temperature must be in
+       deg C and salinity in kg / kg; no unit parsing or range checking
+       is done.  The results are in mks units.
+
+       JAX computes in single precision by default, which is well within
+       the 0.1% accuracy of the correlation.  Enable double precision with
+       jax.config.update("jax_enable_x64", True) if needed.
+
+     See also: sw_density.rho_sw, sw_density.drho_sw_dT,
+               sw_density.drho_sw_ds
+"""
+
+import jax
+import jax.numpy as jnp
+
+from sw_properties.sw_density import a, b
+
+
+@jax.jit
+def rho_sw_jax(T, s=0.0):
+    '''
+    Returns the density of seawater in mks units
+
+    Temperature must be in deg C.  Salinity must be in kg / kg
+    '''
+    T = jnp.asarray(T)
+    s = jnp.asarray(s)
+    return (a[0] + T*(a[1] + T*(a[2] + T*(a[3] + T*a[4])))
+            + s*(b[0] + T*(b[1] + T*(b[2] + s*b[4] + T*b[3]))))
+
+
+# Elementwise derivatives of rho_sw_jax.  jax.grad only accepts floating
+# point arguments, so T and s are cast by the wrappers below
+_drho_sw_dT = jnp.vectorize(jax.grad(rho_sw_jax, 0))
+_drho_sw_ds = jnp.vectorize(jax.grad(rho_sw_jax, 1))
+
+
+def _as_float(x):
+    return jnp.asarray(x, dtype=jnp.result_type(float))
+
+
+@jax.jit
+def drho_sw_dT_jax(T, s=0.0):
+    '''
+    Returns derivative of rho_sw_jax wrt temperature, in mks units
+    '''
+    return _drho_sw_dT(_as_float(T), _as_float(s))
+
+
+@jax.jit
+def drho_sw_ds_jax(T, s=0.0):
+    '''
+    Returns derivative of rho_sw_jax wrt salinity, in mks units
+    '''
+    return _drho_sw_ds(_as_float(T), _as_float(s))
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+"""
+    sw_density_numba    Compiled kernels for the density of seawater
+
+     DESCRIPTION:
+       Numba versions of the polynomials in sw_density, used by rho_sw for
+       large array input when numba is installed.  The kernels take the
+       temperature [degC] and salinity [kg/kg] as flattened, contiguous
+       float64 arrays and write the density [kg/m^3] into out.
+
+       The coefficient arrays are passed in explicitly (see sw_density._A
+       and sw_density._B) so that this module does not depend on
+       sw_density itself.
+
+       The kernels are compiled for the host CPU, so with fastmath the
+       Horner steps are contracted to fused multiply-adds and the loop is
+       vectorised to the available SIMD width (e.g. AVX2).  The
+       coefficients are read into locals before the loop so that they
+       are held in registers rather than reloaded for each element.
+"""
+
+from numba import njit, prange
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _rho_sw_kernel(T, s, a, b, out):
+    '''
+    Evaluates rho_plain_water(T) + delta_rho(T, s) elementwise into out
+    '''
+    a0, a1, a2, a3, a4 = a[0], a[1], a[2], a[3], a[4]
+    b0, b1, b2, b3, b4 = b[0], b[1], b[2], b[3], b[4]
+    for i in prange(T.size):
+        t  = T[i]
+        si = s[i]
+        out[i] = (a0 + t*(a1 + t*(a2 + t*(a3 + t*a4)))
+                  + si*(b0 + t*(b1 + t*(b2 + si*b4 + t*b3))))
+    return out
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _rho_sw_fixed_s_kernel(T, s, a, b, out):
+    '''
+    As _rho_sw_kernel for a single salinity s, which is folded into the
+    coefficients of one polynomial in T before the loop
+    '''
+    c0 = a[0] + s*b[0]
+    c1 = a[1] + s*b[1]
+    c2 = a[2] + s*(b[2] + s*b[4])
+    c3 = a[3] + s*b[3]
+    c4 = a[4]
+    for i in prange(T.size):
+        t = T[i]
+        out[i] = c0 + t*(c1 + t*(c2 + t*(c3 + t*c4)))
+    return out
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def _rho_sw_pairs_kernel(TS, a, b, out):
+    '''
+    As _rho_sw_kernel, for temperature and salinity interleaved as the
+    columns of a contiguous (N, 2) array TS
+    '''
+    a0, a1, a2, a3, a4 = a[0], a[1], a[2], a[3], a[4]
+    b0, b1, b2, b3, b4 = b[0], b[1], b[2], b[3], b[4]
+    for i in prange(TS.shape[0]):
+        t  = TS[i, 0]
+        si = TS[i, 1]
+        out[i] = (a0 + t*(a1 + t*(a2 + t*(a3 + t*a4)))
+                  + si*(b0 + t*(b1 + t*(b2 + si*b4 + t*b3))))
+    return out
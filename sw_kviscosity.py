@@ -4,12 +4,13 @@
     sw_kviscosity  kinematic viscosity of seawater
 """
 
-from sw_properties.sw_utils import parse_units
-from sw_properties.sw_density import rho_sw
-from sw_properties.sw_viscosity import dynamic_viscosity
+from sw_properties.sw_utils import parse_units, _parse_units_fast
+from sw_properties.sw_density import _rho_sw_raw
+from sw_properties.sw_viscosity import _dynamic_viscosity_raw
 
 
-def kinematic_viscosity(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
+def kinematic_viscosity(T, S=0.0, uT='C', uS='ppt', output_units='cgs',
+                        _unchecked=False):
     """
     Returns an estimate for the kinematic viscosity of salt water.
 
@@ -28,11 +29,19 @@ def kinematic_viscosity(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
 
     Note that the subfunctions use the fractional salinity, whereas the input 
     salinity is in ppt by default.  This is dealt with using the "parse_units"
-    routine from sw_utils.  
+    routine from sw_utils, called once here before evaluating the dynamic 
+    viscosity and density.  The result is in cm2/s ('cgs') or m2/s ('mks').
+    The range check in parse_units is skipped if _unchecked is True, for 
+    inputs already known to be valid.
     
     See also
     --------
     dynamic_viscosity, rho_sw
     """
-    T, S = parse_units(T, S, uT, uS)
-    return dynamic_viscosity(T, S) / rho_sw(T, S)
+    parse = _parse_units_fast if _unchecked else parse_units
+    T, s = parse(T, S, uT, uS)
+    nu = _dynamic_viscosity_raw(T, s) / _rho_sw_raw(T, s) # in mks
+    if output_units == 'cgs':
+        return nu * 1e4
+    else:
+        return nu
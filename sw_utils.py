@@ -1,56 +1,66 @@
+import numpy as np
+
+
+# Temperature units as (scale, offset) such that T[degC] = scale*(T + offset).
+# Applying the offset first keeps the rounding of 5/9*(T - 32), so that e.g.
+# 356 F converts to exactly 180 degC
+_T_SCALE_OFFSET = {'c': (1., 0.),
+                   'k': (1., -273.15),
+                   'f': (5./9., -32.),
+                   'r': (5./9., -491.67)}
+
+# Salinity units as the divisor converting to [kg/kg].  Dividing, as in
+# S/1000, keeps the validity bound exact (160 g/kg is 0.16 kg/kg) in both
+# double and single precision, whereas 1e-3 is inexact in float32
+_S_DIVISOR = {'ppt': 1e3,
+              'ppm': 1e6,
+              'w':   1.,
+              '%':   1e2}
+
+
 def parse_units(T=20., S=0., uT='C', uS='ppt'):
     '''
-    Returns temperature and salinity in degC and ppt, the default values for
-    this suite of programmes.
+    Returns temperature and salinity in degC and kg/kg, as required by the
+    subfunctions of this suite of programmes.
 
-    Also checks that the variables are within the tolerated range.
+    Also checks that the variables are within the tolerated range, raising
+    a ValueError if not.
     '''
-    import numpy as np
-
-    # Check types, and parse as necessary
-    if isinstance(S, int):
-        S = float(S)
-    if isinstance(S, np.ndarray):
-        S = S.astype(float)
-
-    # Temperature unit checks
-    uT = uT.lower()
-    if uT == 'c':
-        pass
-    elif uT == 'k':
-        T -= 273.15
-    elif uT == 'f':
-        T = 5./9. * (T - 32.)
-    elif uT == 'r':
-        T = 5./9. * (T - 491.67)
-    else:
-        raise TypeError('Not a recognized temperature unit.  '
-                        + 'Please use "C", "K", "F", or "R"')
-    uT = 'C'
-    
-    # Salinity unit checks
-    uS = uS.lower()
-    if uS == 'ppt':
-        pass
-    elif uS == 'ppm':
-        S = S / 1000
-    elif uS == 'w':
-        S = S * 1000
-    elif uS == '%':
-        S = S * 100
-    else:
-        raise TypeError('Not a recognized temperature unit.  '
-                        + 'Please use "ppt", "ppm", "w", or "%"')
-    uS = 'ppt'
+    T, S = _parse_units_fast(T, S, uT, uS)
 
-    # Warnings for temperature or salinity out of range
-    assert (np.logical_and(0 <= T, T <= 180).any() \
-            and np.logical_and(0 <= S, S <= 160).any()), \
-        'Temperature and/or salinity are outside of accepted ranges: ' \
-        '0 <= T <= 180 degC, 0 <= S <= 160 g/kg'
-        
-    S /= 1000   # Following routines require S in [kg/kg]
+    # Errors for temperature or salinity out of range
+    if isinstance(T, np.ndarray) or isinstance(S, np.ndarray):
+        in_range = (np.all((0 <= T) & (T <= 180))
+                    and np.all((0 <= S) & (S <= .160)))
+    else:
+        in_range = (0 <= T <= 180) and (0 <= S <= .160)
+    if not in_range:
+        raise ValueError('Temperature and/or salinity are outside of '
+                         + 'accepted ranges: 0 <= T <= 180 degC, '
+                         + '0 <= S <= 160 g/kg')
 
     return T, S
 
 
+def _parse_units_fast(T=20., S=0., uT='C', uS='ppt'):
+    '''
+    As parse_units, but without the range check
+
+    For use on inputs that are already known to be valid, e.g. inside
+    iterative solvers.
+    '''
+    try:
+        T_scale, T_offset = _T_SCALE_OFFSET[uT.lower()]
+    except KeyError:
+        raise TypeError('Not a recognized temperature unit.  '
+                        + 'Please use "C", "K", "F", or "R"') from None
+    try:
+        S_divisor = _S_DIVISOR[uS.lower()]
+    except KeyError:
+        raise TypeError('Not a recognized salinity unit.  '
+                        + 'Please use "ppt", "ppm", "w", or "%"') from None
+
+    T = T_scale * (T + T_offset)
+    S = S / S_divisor   # Following routines require S in [kg/kg]
+
+    return T, S
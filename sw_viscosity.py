@@ -1,7 +1,6 @@
 #!/usr/bin/python
 
 from sw_properties.sw_utils import parse_units
-from sw_properties.sw_density import rho_sw, rho_plain
 
 
 def dynamic_viscosity(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
@@ -67,7 +66,22 @@ def dynamic_viscosity(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
     """
 
     T, S = parse_units(T, S, uT, uS)
+    mu = _dynamic_viscosity_raw(T, S) # in mks
 
+    # Check for units
+    if output_units == 'cgs':
+        return mu * 10
+    else:
+        return mu
+
+
+def _dynamic_viscosity_raw(T, S=0.0):
+    """
+    Returns the dynamic viscosity of seawater in mks units, without unit
+    parsing
+
+    Temperature must be in deg C.  Salinity must be in kg / kg
+    """
     # Array of constants
     a = [
         1.5700386464E-01,
@@ -87,17 +101,11 @@ def dynamic_viscosity(T, S=0.0, uT='C', uS='ppt', output_units='cgs'):
     A  = a[4] + a[5] * T + a[6] * T**2
     B  = a[7] + a[8] * T + a[9] * T**2
 
-    mu = mu_temp * (1 + A * S + B * S**2) # in mks
-
-    # Check for units
-    if output_units == 'cgs':
-        return mu * 10
-    else:
-        return mu
+    return mu_temp * (1 + A * S + B * S**2) # in mks
 
 
 if __name__ == "__main__":
-    from SW_Properties.SW_Kviscosity import kinematic_viscosity
+    from sw_properties.sw_kviscosity import kinematic_viscosity
 
     T, S = 20, 30
 
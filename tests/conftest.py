@@ -0,0 +1,21 @@
+"""
+Makes the repository importable as the sw_properties package, whatever the
+name of the directory it was cloned into.  This also stops the legacy module
+sw_properties.py from shadowing the package when the tests are run from the
+repository root.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_spec = importlib.util.find_spec('sw_properties')
+if _spec is None or _spec.origin != str(ROOT / '__init__.py'):
+    spec = importlib.util.spec_from_file_location(
+        'sw_properties', ROOT / '__init__.py',
+        submodule_search_locations=[str(ROOT)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['sw_properties'] = module
+    spec.loader.exec_module(module)
@@ -0,0 +1,392 @@
+"""
+Tests for sw_properties.  The rewritten and alternative evaluation paths are
+checked against rho_sw and against the correlations written out monomial by
+monomial.
+"""
+
+import numpy as np
+import pytest
+
+import sw_properties as sp
+from sw_properties import sw_density
+
+
+@pytest.fixture
+def Ts():
+    '''
+    Temperature [degC] and salinity [kg/kg] arrays, large enough to take the
+    compiled paths of rho_sw and more than one block of rho_sw_batch
+    '''
+    rng = np.random.default_rng(0)
+    n = 2*sw_density._BATCH_CHUNK + 123
+    return rng.uniform(0, 90, n), rng.uniform(0, .12, n)
+
+
+@pytest.fixture
+def numpy_only(monkeypatch):
+    '''
+    Disables the optional numba and numexpr back ends of sw_density
+    '''
+    for name in ('_rho_sw_kernel', '_rho_sw_fixed_s_kernel',
+                 '_rho_sw_pairs_kernel', 'numexpr'):
+        monkeypatch.setattr(sw_density, name, None)
+
+
+def expanded_rho_sw(T, s):
+    '''
+    rho_sw in mks units, written out monomial by monomial
+    '''
+    a, b = sw_density.a, sw_density.b
+    return (a[0] + a[1]*T + a[2]*T**2 + a[3]*T**3 + a[4]*T**4
+            + b[0]*s + b[1]*s*T + b[2]*s*T**2 + b[3]*s*T**3
+            + b[4]*s**2*T**2)
+
+
+# Kinematic viscosity
+
+def test_kinematic_viscosity_parses_salinity_once():
+    nu = sp.kinematic_viscosity(20, 35)
+    assert nu == pytest.approx(sp.dynamic_viscosity(20, 35)
+                               / sp.rho_sw(20, 35), rel=1e-12)
+    # Salinity used to be divided by 1000 twice, giving the plain water value
+    assert nu == pytest.approx(0.010504, abs=1e-6)
+
+
+def test_kinematic_viscosity_mks():
+    assert (sp.kinematic_viscosity(20, 35, output_units='mks')
+            == pytest.approx(1e-4 * sp.kinematic_viscosity(20, 35),
+                             rel=1e-12))
+
+
+# Horner and Estrin forms of the subfunctions
+
+def test_rho_sw_numpy(Ts, numpy_only):
+    T, s = Ts
+    np.testing.assert_allclose(sp.rho_sw(T, 1e3*s, output_units='mks'),
+                               expanded_rho_sw(T, s), rtol=1e-12)
+    assert sp.rho_sw(20., 35., output_units='mks') == pytest.approx(
+        expanded_rho_sw(20., .035), rel=1e-12)
+
+
+def test_rho_plain_water_scalar():
+    a = sw_density.a
+    for T in (0., 4., 20., 90., 180.):
+        assert sp.rho_plain_water(T) == pytest.approx(
+            a[0] + a[1]*T + a[2]*T**2 + a[3]*T**3 + a[4]*T**4, rel=1e-14)
+
+
+def test_drho_plain_water_dT(Ts):
+    T, _ = Ts
+    a = sw_density.a
+    np.testing.assert_allclose(
+        sp.drho_plain_water_dT(T),
+        a[1] + 2*a[2]*T + 3*a[3]*T**2 + 4*a[4]*T**3, rtol=1e-12)
+    assert sp.drho_plain_water_dT(20.) == pytest.approx(
+        a[1] + 40*a[2] + 1200*a[3] + 32000*a[4], rel=1e-12)
+
+
+def test_ddelta_rho_dT(Ts):
+    T, s = Ts
+    b = sw_density.b
+    np.testing.assert_allclose(
+        sp.ddelta_rho_dT(T, s),
+        b[1]*s + 2*b[2]*s*T + 3*b[3]*s*T**2 + 2*b[4]*s**2*T,
+        rtol=1e-12, atol=1e-12)
+
+
+def test_ddelta_rho_ds(Ts):
+    T, s = Ts
+    b = sw_density.b
+    np.testing.assert_allclose(
+        sp.ddelta_rho_ds(T, s),
+        b[0] + b[1]*T + b[2]*T**2 + b[3]*T**3 + 2*b[4]*s*T**2,
+        rtol=1e-12)
+
+
+def test_delta_rho_factored(Ts):
+    T, s = Ts
+    np.testing.assert_allclose(sp.rho_plain_water(T) + sp.delta_rho(T, s),
+                               expanded_rho_sw(T, s), rtol=1e-12)
+    assert sp.delta_rho(20., 0.) == 0.
+
+
+# Shared powers of T
+
+def test_powers(Ts):
+    T, s = Ts
+    P = sp.powers(T)
+    np.testing.assert_allclose(P, [T, T**2, T**3, T**4], rtol=1e-14)
+    np.testing.assert_allclose(sp.rho_plain_water_pow(*P),
+                               sp.rho_plain_water(T), rtol=1e-12)
+    np.testing.assert_allclose(sp.delta_rho_pow(*P[:3], s),
+                               sp.delta_rho(T, s), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(sp.ddelta_rho_ds_pow(*P[:3], s),
+                               sp.ddelta_rho_ds(T, s), rtol=1e-12)
+
+
+# Units
+
+@pytest.mark.parametrize('uT, T_min, T_max', [('C', 0., 180.),
+                                               ('K', 273.15, 453.15),
+                                               ('F', 32., 356.),
+                                               ('R', 491.67, 815.67)])
+def test_temperature_unit_bounds(uT, T_min, T_max):
+    # The bounds convert without rounding out of range, so are accepted
+    T, _ = sp.parse_units(T_min, 0., uT=uT)
+    assert T == 0.
+    T, _ = sp.parse_units(T_max, 0., uT=uT)
+    assert T == pytest.approx(180., abs=1e-12)
+    T, _ = sp.parse_units(np.array([T_min, T_max]), 0., uT=uT)
+    np.testing.assert_allclose(T, [0., 180.], atol=1e-12)
+
+
+@pytest.mark.parametrize('uS, S_max', [('ppt', 160.), ('ppm', 160e3),
+                                        ('w', .16), ('%', 16.)])
+def test_salinity_unit_bounds(uS, S_max):
+    _, s = sp.parse_units(20., S_max, uS=uS)
+    assert s == pytest.approx(.16, rel=1e-15)
+    _, s = sp.parse_units(20., 0., uS=uS)
+    assert s == 0.
+
+
+@pytest.mark.parametrize('T, S', [(-1., 35.), (181., 35.), (20., -1.),
+                                  (20., 161.)])
+def test_parse_units_out_of_range(T, S):
+    with pytest.raises(ValueError):
+        sp.parse_units(T, S)
+    # Any element out of range fails the whole array
+    with pytest.raises(ValueError):
+        sp.parse_units(np.array([20., T]), np.array([35., S]))
+
+
+def test_parse_units_bad_units():
+    with pytest.raises(TypeError):
+        sp.parse_units(20., 35., uT='X')
+    with pytest.raises(TypeError):
+        sp.parse_units(20., 35., uS='X')
+
+
+def test_unchecked_skips_range_check():
+    with pytest.raises(ValueError):
+        sp.rho_sw(200., 35.)
+    with pytest.raises(ValueError):
+        sp.kinematic_viscosity(np.array([20., 200.]), 35.)
+    assert sp.rho_sw(200., 35., _unchecked=True) == pytest.approx(
+        expanded_rho_sw(200., .035) / 1e3, rel=1e-12)
+    nu = sp.kinematic_viscosity(np.array([20., 200.]), 35., _unchecked=True)
+    assert nu[0] == pytest.approx(sp.kinematic_viscosity(20., 35.))
+    assert np.isfinite(nu[1])
+
+
+def test_percent_salinity():
+    assert sp.rho_sw(20, 3.5, uS='%') == pytest.approx(sp.rho_sw(20, 35))
+
+
+def test_solve_salinity_arrays():
+    target = np.linspace(1.0, 1.1, 11)
+    T = np.linspace(5., 60., 11)
+    S = sp.solve_salinity(target, T=T)
+    assert S.shape == target.shape
+    np.testing.assert_allclose(sp.rho_sw(T, S), target, atol=1e-8)
+    # Broadcasting a column of targets against a row of temperatures
+    S = sp.solve_salinity(target[:, None], T=T[None, :4])
+    assert S.shape == (11, 4)
+    np.testing.assert_allclose(sp.rho_sw(T[None, :4], S),
+                               np.broadcast_to(target[:, None], S.shape),
+                               atol=1e-8)
+
+
+def test_solve_salinity_scalar():
+    S = sp.solve_salinity(1.01, tol=1e-12)
+    assert np.ndim(S) == 0
+    assert sp.rho_sw(20., float(S)) == pytest.approx(1.01, abs=1e-12)
+    pytest.importorskip('scipy')
+    assert S == pytest.approx(sp.required_salinity(1.01, 30., 20.),
+                              abs=1e-6)
+
+
+def test_solve_salinity_not_converged():
+    with pytest.raises(RuntimeError):
+        sp.solve_salinity(np.array([1.01, 1.05]), maxiter=1)
+
+
+# Compiled and fused back ends
+
+def test_rho_sw_numba(Ts):
+    pytest.importorskip('numba')
+    assert sw_density._rho_sw_kernel is not None
+    T, s = Ts
+    np.testing.assert_allclose(sp.rho_sw(T, 1e3*s, output_units='mks'),
+                               expanded_rho_sw(T, s), rtol=1e-12)
+
+
+def test_rho_sw_numexpr(Ts, monkeypatch):
+    pytest.importorskip('numexpr')
+    monkeypatch.setattr(sw_density, '_rho_sw_kernel', None)
+    T, s = Ts
+    np.testing.assert_allclose(sp.rho_sw(T, 1e3*s, output_units='mks'),
+                               expanded_rho_sw(T, s), rtol=1e-12)
+
+
+# Bulk entry points
+
+@pytest.mark.parametrize('backend', ['numba', 'numpy'])
+def test_rho_sw_batch(Ts, backend, request):
+    if backend == 'numba':
+        pytest.importorskip('numba')
+    else:
+        request.getfixturevalue('numpy_only')
+    T, s = Ts
+    # More than one block of _BATCH_CHUNK, with a partial last block
+    assert T.size % sw_density._BATCH_CHUNK
+    np.testing.assert_allclose(sp.rho_sw_batch(T, 1e3*s),
+                               sp.rho_sw(T, 1e3*s), rtol=1e-12)
+    np.testing.assert_allclose(sp.rho_sw_batch(T, 35.), sp.rho_sw(T, 35.),
+                               rtol=1e-12)
+    assert sp.rho_sw_batch(20., 35.) == pytest.approx(sp.rho_sw(20., 35.),
+                                                      rel=1e-12)
+
+
+# Salinity for a target density
+
+@pytest.mark.parametrize('S, T', [(5., 5.), (30., 20.), (100., 60.)])
+def test_target_salinity_derivatives(S, T):
+    h = 1e-3
+    f  = lambda S: sp.target_salinity(S, 1.01, T)
+    fp = lambda S: sp.target_salinity_prime(S, 1.01, T)
+    assert sp.target_salinity_prime(S, 1.01, T) == pytest.approx(
+        (f(S + h) - f(S - h)) / (2*h), rel=1e-6)
+    assert sp.target_salinity_prime2(S, 1.01, T) == pytest.approx(
+        (fp(S + h) - fp(S - h)) / (2*h), rel=1e-6)
+
+
+def test_required_salinity():
+    pytest.importorskip('scipy')
+    S = sp.required_salinity(1.01, 30., 20.)
+    assert sp.rho_sw(20., S) == pytest.approx(1.01, abs=1e-10)
+
+
+def test_rho_sw_numba_fixed_salinity(Ts):
+    pytest.importorskip('numba')
+    T, _ = Ts
+    np.testing.assert_allclose(sp.rho_sw(T, 35., output_units='mks'),
+                               expanded_rho_sw(T, .035), rtol=1e-12)
+    np.testing.assert_allclose(sp.rho_sw(T, output_units='mks'),
+                               expanded_rho_sw(T, 0.), rtol=1e-12)
+
+
+def test_plain_water_large_array_uses_kernel(Ts, monkeypatch):
+    pytest.importorskip('numba')
+    T, _ = Ts
+    calls = []
+    kernel = sw_density._rho_sw_fixed_s_kernel
+
+    def spy(T, s, a, b, out):
+        calls.append(s)
+        return kernel(T, s, a, b, out)
+
+    monkeypatch.setattr(sw_density, '_rho_sw_fixed_s_kernel', spy)
+    sp.rho_sw(T)
+    sp.rho_sw(T, 0.)
+    sp.kinematic_viscosity(T)
+    assert calls == [0., 0., 0.]
+
+
+def test_plain_water_large_array_uses_numexpr(Ts, monkeypatch):
+    numexpr = pytest.importorskip('numexpr')
+    monkeypatch.setattr(sw_density, '_rho_sw_kernel', None)
+    T, _ = Ts
+    calls = []
+
+    class Spy:
+        @staticmethod
+        def evaluate(*args, **kwargs):
+            calls.append(args[0])
+            return numexpr.evaluate(*args, **kwargs)
+
+    monkeypatch.setattr(sw_density, 'numexpr', Spy)
+    np.testing.assert_allclose(sp.rho_sw(T, output_units='mks'),
+                               expanded_rho_sw(T, 0.), rtol=1e-12)
+    assert len(calls) == 1
+
+
+def test_rho_sw_inplace(Ts):
+    T, s = Ts
+    ref = sp.rho_sw(T, 1e3*s, output_units='mks')
+    out = np.empty_like(T)
+    assert sp.rho_sw_inplace(T, s, out=out) is out
+    np.testing.assert_allclose(out, ref, rtol=1e-12)
+    np.testing.assert_allclose(sp.rho_sw_inplace(T, s), ref, rtol=1e-12)
+
+
+@pytest.mark.parametrize('alias', ['T', 's', 'both'])
+def test_rho_sw_inplace_aliased(Ts, alias):
+    T, s = (x.copy() for x in Ts)
+    if alias == 'both':
+        T = s
+    ref = sp.rho_sw(T, 1e3*s, output_units='mks')
+    out = T if alias == 'T' else s
+    assert sp.rho_sw_inplace(T, s, out=out) is out
+    np.testing.assert_allclose(out, ref, rtol=1e-12)
+
+
+@pytest.mark.parametrize('backend', ['numba', 'numpy'])
+def test_rho_sw_soa(Ts, backend, request):
+    if backend == 'numba':
+        pytest.importorskip('numba')
+    else:
+        request.getfixturevalue('numpy_only')
+    T, s = Ts
+    ref = sp.rho_sw(T, 1e3*s)
+    # Rows of a (2, N) array, and interleaved pairs in an (N, 2) array
+    np.testing.assert_allclose(sp.rho_sw_soa(np.stack([T, s])), ref,
+                               rtol=1e-12)
+    np.testing.assert_allclose(sp.rho_sw_soa(np.stack([T, s], axis=1)), ref,
+                               rtol=1e-12)
+    with pytest.raises(ValueError):
+        sp.rho_sw_soa(np.zeros((3, 3)))
+
+
+# Single precision
+
+@pytest.mark.parametrize('uT, offset', [('C', 0.), ('K', 273.15)])
+def test_rho_sw_f32(Ts, uT, offset):
+    T, s = Ts
+    rho = sp.rho_sw_f32(T + offset, 1e3*s, uT=uT)
+    assert rho.dtype == np.float32
+    np.testing.assert_allclose(rho, sp.rho_sw(T, 1e3*s), rtol=1e-6)
+    # The unit conversion itself stays in float32
+    T32, s32 = sp.parse_units(np.asarray(T + offset, dtype=np.float32),
+                              np.asarray(1e3*s, dtype=np.float32), uT=uT)
+    assert T32.dtype == s32.dtype == np.float32
+
+
+def test_rho_sw_f32_scalar():
+    rho = sp.rho_sw_f32(20, 35)
+    assert rho.dtype == np.float32
+    assert rho == pytest.approx(sp.rho_sw(20., 35.), rel=1e-6)
+    # The upper salinity bound survives the cast to float32
+    assert sp.rho_sw_f32(20., 160.) == pytest.approx(sp.rho_sw(20., 160.),
+                                                     rel=1e-6)
+
+
+# JAX
+
+def test_rho_sw_jax(Ts):
+    pytest.importorskip('jax')
+    T, s = Ts
+    # JAX computes in float32 unless jax_enable_x64 is set
+    tol = dict(rtol=1e-5, atol=1e-4)
+    np.testing.assert_allclose(sp.rho_sw_jax(T, s),
+                               sp.rho_sw(T, 1e3*s, output_units='mks'), **tol)
+    np.testing.assert_allclose(sp.drho_sw_dT_jax(T, s), sp.drho_sw_dT(T, s),
+                               **tol)
+    np.testing.assert_allclose(sp.drho_sw_ds_jax(T, s), sp.drho_sw_ds(T, s),
+                               **tol)
+    # Default (plain water) salinity, and integer input
+    assert float(sp.drho_sw_dT_jax(20.)) == pytest.approx(
+        sp.drho_sw_dT(20.), rel=1e-5)
+    assert float(sp.drho_sw_ds_jax(20)) == pytest.approx(
+        sp.drho_sw_ds(20.), rel=1e-5)
+    np.testing.assert_allclose(sp.drho_sw_dT_jax(np.arange(90), 0),
+                               sp.drho_sw_dT(np.arange(90.), 0.), **tol)